@@ -1,7 +1,5 @@
 import math
-from typing import List, Optional, Any, Callable, Dict, Set
-from dataclasses import dataclass, field
-from collections import deque
+from typing import List, Optional, Any, Callable, Tuple, Set
 import itertools
 
 
@@ -9,26 +7,51 @@ import itertools
 # 2.1 核心算法实现
 # ==========================================
 
-@dataclass
+# 运算编号: 0:+  1:*  2:a-b  3:b-a  4:a/b  5:b/a
+# 搜索过程中节点只携带数值元组，表达式字符串仅在找到解后
+# 沿 parent 链回放 op_record 重建一次，避免热路径上的字典和字符串拼接
+OP_ADD, OP_MUL, OP_SUB, OP_RSUB, OP_DIV, OP_RDIV = range(6)
+
+
+# 定点化比例: 7560 = 2^3 * 3^3 * 5 * 7，能整除表示常见分数 (1/2, 1/3 ... 1/7 及其组合)
+_KEY_SCALE = 7560
+# 每个数值占 32 位（带偏置表示负数），4 个数打包成一个 int 作为 visited 键
+_KEY_BIAS = 1 << 31
+_KEY_MASK = 0xFFFFFFFF
+
+
+# 搜索只会经过 n=4/3/2 三种状态大小，预先展开每种 n 的 (i, j, 剩余索引) 组合表，
+# 省去热路径上的 itertools.combinations 和剩余列表的条件重建
+_PAIR_TABLE = {
+    n: tuple(
+        (i, j, tuple(k for k in range(n) if k != i and k != j))
+        for i, j in itertools.combinations(range(n), 2)
+    )
+    for n in (2, 3, 4)
+}
+
+
+def _state_key(values: Tuple[float, ...]) -> int:
+    """将状态编码为单个整数键：定点化、排序后按 32 位一格打包"""
+    ints = sorted((round(v * _KEY_SCALE) + _KEY_BIAS) & _KEY_MASK for v in values)
+    key = 0
+    for k, v in enumerate(ints):
+        key |= v << (32 * k)
+    return key
+
+
 class ThoughtNode:
-    """思维树节点"""
-    state: List[Dict[str, Any]]  # 例如: [{'val': 3.0, 'exp': '3'}, {'val': 8.0, 'exp': '8'}]
-    parent: Optional['ThoughtNode'] = None
-    operation: str = "init"
-    depth: int = 0
-    score: float = 0.0
-
-    def __hash__(self):
-        # 为了去重，我们将状态中的数值排序后作为 hash 依据
-        # 注意：这里只hash数值，忽略表达式字符串的差异
-        values = tuple(sorted([round(x['val'], 6) for x in self.state]))
-        return hash(values)
-
-    def get_expression(self) -> str:
-        """回溯获取最终表达式，如果只剩一个元素，直接返回其表达式"""
-        if len(self.state) == 1:
-            return self.state[0]['exp']
-        return ""
+    """思维树节点（__slots__ 精简版，只保留搜索和表达式回放所需字段）"""
+    __slots__ = ('values', 'parent', 'op_record', 'key')
+
+    def __init__(self, values: Tuple[float, ...],
+                 parent: Optional['ThoughtNode'] = None,
+                 op_record: Optional[Tuple[int, int, int]] = None):
+        self.values = values  # 例如: (3.0, 8.0)
+        self.parent = parent
+        self.op_record = op_record  # (i, j, op_id)，记录从父节点到本节点的运算
+        # 构造时一次性算好去重键，省去每次 visited 查询的排序+元组分配
+        self.key = _state_key(values)
 
 
 class TreeOfThoughts:
@@ -39,17 +62,20 @@ class TreeOfThoughts:
             thought_generator: Callable[[ThoughtNode], List[ThoughtNode]],
             state_evaluator: Callable[[ThoughtNode], float],
             goal_checker: Callable[[ThoughtNode], bool],
-            strategy: str = 'bfs'
+            strategy: str = 'bfs',
+            node_releaser: Optional[Callable[[ThoughtNode], None]] = None
     ):
         self.thought_generator = thought_generator
         self.state_evaluator = state_evaluator
         self.goal_checker = goal_checker
         self.strategy = strategy
+        # 可选回收回调：搜索确定不再引用某个节点时调用，配合对象池复用节点
+        self.node_releaser = node_releaser
         self.visited: Set[int] = set()
 
-    def search(self, initial_state: Any) -> Optional[ThoughtNode]:
+    def search(self, initial_values: Tuple[float, ...]) -> Optional[ThoughtNode]:
         """执行搜索"""
-        root = ThoughtNode(state=initial_state, depth=0)
+        root = ThoughtNode(values=initial_values)
 
         if self.strategy == 'bfs':
             return self._bfs(root)
@@ -59,11 +85,15 @@ class TreeOfThoughts:
             raise ValueError(f"Unknown strategy: {self.strategy}")
 
     def _bfs(self, root: ThoughtNode) -> Optional[ThoughtNode]:
-        queue = deque([root])
-        self.visited.add(hash(root))
+        # 平铺列表 + 头指针代替 deque：append 只在尾部，出队只挪下标，
+        # 免去每轮 popleft 的方法调用；整个队列即一块连续数组
+        queue = [root]
+        head = 0
+        self.visited.add(root.key)
 
-        while queue:
-            current_node = queue.popleft()
+        while head < len(queue):
+            current_node = queue[head]
+            head += 1
 
             # 检查是否达成目标
             if self.goal_checker(current_node):
@@ -76,33 +106,31 @@ class TreeOfThoughts:
             next_thoughts = self.thought_generator(current_node)
 
             for thought in next_thoughts:
-                h = hash(thought)
+                h = thought.key
                 if h not in self.visited:
                     self.visited.add(h)
                     queue.append(thought)
+                elif self.node_releaser is not None:
+                    # 命中 visited 的重复节点直接回收复用
+                    self.node_releaser(thought)
 
         return None
 
     def _dfs(self, root: ThoughtNode) -> Optional[ThoughtNode]:
-        # 使用栈实现迭代式 DFS
-        stack = [root]
-        self.visited.add(hash(root))
-
-        while stack:
-            current_node = stack.pop()
-
-            if self.goal_checker(current_node):
-                return current_node
-
-            # 生成思维
-            next_thoughts = self.thought_generator(current_node)
-
-            # 对于DFS，通常反向入栈以保持生成顺序（或者无所谓）
-            for thought in next_thoughts:
-                h = hash(thought)
-                if h not in self.visited:
-                    self.visited.add(h)
-                    stack.append(thought)
+        # 深度受限的递归 DFS：24点每步合并两个数，4 个数最多走 3 层，
+        # 栈深恒定为 3，不需要 BFS 那样的整层队列。
+        # 这里故意不用全局 visited——深度 3 的重复展开代价低于
+        # 每个子节点建键+查表的代价，且内存占用从上千节点降到一条路径
+        if self.goal_checker(root):
+            return root
+
+        for thought in self.thought_generator(root):
+            found = self._dfs(thought)
+            if found is not None:
+                return found
+            # 该分支已探索完且无解，节点不会再被引用，可回收复用
+            if self.node_releaser is not None:
+                self.node_releaser(thought)
         return None
 
 
@@ -115,8 +143,14 @@ class Point24Solver:
             thought_generator=self.generate_thoughts,
             state_evaluator=self.evaluate_state,
             goal_checker=self.check_goal,
-            strategy='bfs'  # 默认使用 BFS
+            strategy='dfs',  # 默认使用深度受限 DFS（内存 O(深度)，BFS 仍可选）
+            node_releaser=self._release_node
         )
+        # 结果缓存：输入是多重集（与顺序无关），按排序后的元组做键
+        # 不同输入的可解性互不影响，缓存可跨 solve 调用复用
+        self._solve_memo: dict = {}
+        # 节点对象池：每次展开产生的大批临时节点回收复用，减少分配/GC 压力
+        self._node_pool: List[ThoughtNode] = []
 
     def solve(self, numbers: List[int]) -> Optional[str]:
         """
@@ -126,90 +160,119 @@ class Point24Solver:
         Returns:
             表达式字符串，无解返回None
         """
-        # 1. 构造初始状态
-        # 状态格式: list of dict {'val': float, 'exp': str}
-        initial_state = [{'val': float(x), 'exp': str(x)} for x in numbers]
+        # 0. 查缓存：同一多重集只搜索一次
+        memo_key = tuple(sorted(numbers))
+        if memo_key in self._solve_memo:
+            return self._solve_memo[memo_key]
+
+        # 1. 构造初始状态（只保留数值，表达式在找到解后再重建）
+        initial_values = tuple(float(x) for x in numbers)
 
         # 2. 清空缓存
         self.tot.visited.clear()
 
         # 3. 运行搜索
-        result_node = self.tot.search(initial_state)
+        result_node = self.tot.search(initial_values)
 
         if result_node:
-            # 找到解，返回表达式，并附加 = 24
-            expr = result_node.state[0]['exp']
-            return f"{expr} = 24"
-        return None
+            # 找到解，回放 op_record 重建表达式，并附加 = 24
+            expr = self._reconstruct_expression(result_node, numbers)
+            answer = f"{expr} = 24"
+        else:
+            answer = None
+
+        self._solve_memo[memo_key] = answer
+        return answer
 
     # --- ToT 必要的组件方法 ---
 
     def generate_thoughts(self, node: ThoughtNode) -> List[ThoughtNode]:
         """思维生成器：从当前状态生成所有可能的下一步状态"""
-        current_list = node.state
+        values = node.values
         next_nodes = []
 
         # 如果只剩1个或0个数字，无法继续运算
-        if len(current_list) < 2:
+        n = len(values)
+        if n < 2:
             return []
 
-        # 从列表中任取两个数进行运算
-        # itertools.combinations 返回不重复的组合索引会有问题，我们需要取索引
-        indices = range(len(current_list))
-        for i, j in itertools.combinations(indices, 2):
-            item1 = current_list[i]
-            item2 = current_list[j]
-
-            # 剩下的列表（未参与运算的部分）
-            remaining = [current_list[k] for k in indices if k != i and k != j]
-
-            # 尝试四则运算
-            # 加法
-            next_nodes.append(self._create_node(
-                item1['val'] + item2['val'],
-                f"({item1['exp']} + {item2['exp']})",
-                remaining, node
-            ))
-
-            # 乘法
-            next_nodes.append(self._create_node(
-                item1['val'] * item2['val'],
-                f"({item1['exp']} * {item2['exp']})",
-                remaining, node
-            ))
-
-            # 减法 (注意顺序: a-b 和 b-a)
-            next_nodes.append(self._create_node(
-                item1['val'] - item2['val'],
-                f"({item1['exp']} - {item2['exp']})",
-                remaining, node
-            ))
-            next_nodes.append(self._create_node(
-                item2['val'] - item1['val'],
-                f"({item2['exp']} - {item1['exp']})",
-                remaining, node
-            ))
-
-            # 除法 (注意分母不为0)
-            if abs(item2['val']) > 1e-6:
-                next_nodes.append(self._create_node(
-                    item1['val'] / item2['val'],
-                    f"({item1['exp']} / {item2['exp']})",
-                    remaining, node
-                ))
-            if abs(item1['val']) > 1e-6:
-                next_nodes.append(self._create_node(
-                    item2['val'] / item1['val'],
-                    f"({item2['exp']} / {item1['exp']})",
-                    remaining, node
-                ))
+        # 从元组中任取两个数进行运算（查预展开的组合表）
+        append = next_nodes.append
+        create = self._create_node
+        for i, j, rest in _PAIR_TABLE[n]:
+            a = values[i]
+            b = values[j]
+
+            # 剩下的数值（未参与运算的部分）
+            remaining = tuple(values[k] for k in rest)
+
+            # 六种运算一次算完，非法运算产出 inf 占位，之后统一按
+            # isfinite 过滤，代替逐运算的 if/append 分支。
+            # a == b 时 b-a / b/a 与 a-b / a/b 结果相同，生成期直接剪掉，
+            # 对重复数字多的输入（如 [1,1,1,1]）可少展开约一半分支
+            same = a == b
+            results = (
+                a + b,                                             # OP_ADD
+                a * b,                                             # OP_MUL
+                a - b,                                             # OP_SUB
+                math.inf if same else b - a,                       # OP_RSUB
+                a / b if abs(b) > 1e-6 else math.inf,              # OP_DIV
+                b / a if not same and abs(a) > 1e-6 else math.inf, # OP_RDIV
+            )
+            for op_id, result in enumerate(results):
+                if math.isfinite(result):
+                    append(create(result, i, j, op_id, remaining, node))
 
         return next_nodes
 
-    def _create_node(self, new_val: float, new_exp: str, remaining: List[Dict], parent: ThoughtNode) -> ThoughtNode:
-        """辅助函数：创建新节点"""
-        new_state = remaining + [{'val': new_val, 'exp': new_exp}]
-        return ThoughtNode(state=new_state, parent=parent, depth=parent.depth + 1)
+    def _create_node(self, new_val: float, i: int, j: int, op_id: int,
+                     remaining: Tuple[float, ...], parent: ThoughtNode) -> ThoughtNode:
+        """辅助函数：创建新节点（优先从对象池复用）"""
+        new_values = remaining + (new_val,)
+        pool = self._node_pool
+        if pool:
+            node = pool.pop()
+            node.values = new_values
+            node.parent = parent
+            node.op_record = (i, j, op_id)
+            node.key = _state_key(new_values)
+            return node
+        return ThoughtNode(values=new_values, parent=parent,
+                           op_record=(i, j, op_id))
+
+    def _release_node(self, node: ThoughtNode):
+        """辅助函数：搜索弃用的节点归还对象池"""
+        self._node_pool.append(node)
+
+    def _reconstruct_expression(self, node: ThoughtNode, numbers: List[int]) -> str:
+        """沿 parent 链回放 op_record，一次性重建最终表达式"""
+        # 收集根到叶的运算记录
+        records = []
+        cur = node
+        while cur.op_record is not None:
+            records.append(cur.op_record)
+            cur = cur.parent
+        records.reverse()
+
+        # 与 values 元组保持相同的排列顺序，对表达式字符串做同样的变换
+        exps = [str(x) for x in numbers]
+        for i, j, op_id in records:
+            ea, eb = exps[i], exps[j]
+            if op_id == OP_ADD:
+                new_exp = f"({ea} + {eb})"
+            elif op_id == OP_MUL:
+                new_exp = f"({ea} * {eb})"
+            elif op_id == OP_SUB:
+                new_exp = f"({ea} - {eb})"
+            elif op_id == OP_RSUB:
+                new_exp = f"({eb} - {ea})"
+            elif op_id == OP_DIV:
+                new_exp = f"({ea} / {eb})"
+            else:
+                new_exp = f"({eb} / {ea})"
+            exps = [e for k, e in enumerate(exps) if k != i and k != j]
+            exps.append(new_exp)
+        return exps[0]
 
     def evaluate_state(self, node: ThoughtNode) -> float:
         """简单评估函数"""
@@ -220,8 +283,8 @@ class Point24Solver:
 
     def check_goal(self, node: ThoughtNode) -> bool:
         """目标检测：剩下一个数，且约为24"""
-        if len(node.state) == 1:
-            return math.isclose(node.state[0]['val'], 24.0, rel_tol=1e-5)
+        if len(node.values) == 1:
+            return math.isclose(node.values[0], 24.0, rel_tol=1e-5)
         return False
 
 
@@ -29,33 +29,63 @@ def _trim_messages(messages: list, memory_context: str = "") -> list:
     Memory context is injected into system message but not counted in the 6-message limit.
     """
     recent = messages[-6:]
-    if not any(m.type == "system" for m in recent):
-        # Inject system message with memory context
-        system_content = SYSTEM_PROMPT
+    # Single pass: find the system message index once instead of an any()
+    # scan followed by a second enumerate scan.
+    sys_idx = next((i for i, m in enumerate(recent) if m.type == "system"), -1)
+    if sys_idx < 0:
+        # Inject system message with memory context, keeping the last 5
+        # non-system messages (one slice instead of repeated pop(1) shifts).
+        # Without memory context, reuse the module-level SYSTEM_MESSAGE
+        # constant rather than constructing an identical message per turn.
         if memory_context:
-            system_content = f"{memory_context}\n\n{SYSTEM_PROMPT}"
-        recent = [SystemMessage(content=system_content)] + recent
-        while len(recent) > 6:
-            recent.pop(1)
-    else:
+            sys_msg = SystemMessage(content=f"{memory_context}\n\n{SYSTEM_PROMPT}")
+        else:
+            sys_msg = SYSTEM_MESSAGE
+        recent = [sys_msg] + recent[-5:]
+    elif memory_context:
         # Update existing system message with memory context
-        if memory_context:
-            for i, m in enumerate(recent):
-                if m.type == "system":
-                    recent[i] = SystemMessage(content=f"{memory_context}\n\n{m.content}")
-                    break
+        recent[sys_idx] = SystemMessage(
+            content=f"{memory_context}\n\n{recent[sys_idx].content}"
+        )
     return recent
 
 
+# Compiled graphs keyed by the inputs that shape them. Construction is
+# not free — bind_tools serializes every tool schema and StateGraph
+# compilation walks the node/edge definitions — and callers tend to
+# rebuild with the same llm/store/tool set, so repeats return the
+# already-compiled graph.
+_graph_cache: dict = {}
+
+
 def build_graph(llm, memory_store: Optional[MemoryStore] = None, extra_tools: list = None):
     """
     Build the agent graph with memory integration and dynamic tool support.
-    
+    Repeated calls with the same llm, memory store and tool set return
+    the same compiled graph.
+
     Args:
         llm: The language model
         memory_store: Optional MemoryStore for long-term memory
         extra_tools: Optional list of additional tools (e.g., from MCP)
     """
+    # Keyed by identity for llm/store (the compiled graph closes over
+    # both) and by tool names for the tool list.
+    key = (
+        id(llm),
+        id(memory_store) if memory_store is not None else None,
+        tuple(t.name for t in extra_tools) if extra_tools else (),
+    )
+    cached = _graph_cache.get(key)
+    if cached is not None:
+        return cached
+
+    graph = _build_graph_impl(llm, memory_store, extra_tools)
+    _graph_cache[key] = graph
+    return graph
+
+
+def _build_graph_impl(llm, memory_store: Optional[MemoryStore], extra_tools: list):
     # Combine local_search with any extra tools
     all_tools = [local_search]
     if extra_tools:
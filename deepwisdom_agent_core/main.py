@@ -1,4 +1,6 @@
 ﻿import os
+from concurrent.futures import ThreadPoolExecutor
+
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from graph import build_graph, SYSTEM_MESSAGE
@@ -28,37 +30,51 @@ def run():
 
     messages = [SYSTEM_MESSAGE]
     conversation_buffer = []  # Buffer for memory extraction
+    # Single worker so extractions run in order, off the reply path: the
+    # extra LLM call happens while the user reads the reply instead of
+    # adding its latency to every 6th turn
+    memory_executor = ThreadPoolExecutor(max_workers=1)
     print("Type 'exit' or 'quit' to stop.")
 
-    while True:
-        try:
-            user_input = input("You> ").strip()
-        except (EOFError, KeyboardInterrupt):
-            print()
-            break
+    try:
+        while True:
+            try:
+                user_input = input("You> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                break
+
+            if not user_input:
+                continue
+            if user_input.lower() in {"exit", "quit"}:
+                break
+
+            # Add to conversation buffer for memory extraction
+            conversation_buffer.append(f"User: {user_input}")
 
-        if not user_input:
-            continue
-        if user_input.lower() in {"exit", "quit"}:
-            break
+            state = {"messages": messages + [HumanMessage(content=user_input)]}
+            result = app.invoke(state)
+            messages = result["messages"]
 
-        # Add to conversation buffer for memory extraction
-        conversation_buffer.append(f"User: {user_input}")
+            reply = next((m.content for m in reversed(messages) if m.type == "ai"), "")
+            print(f"Agent> {reply}")
 
-        state = {"messages": messages + [HumanMessage(content=user_input)]}
-        result = app.invoke(state)
-        messages = result["messages"]
+            # Add agent response to buffer
+            conversation_buffer.append(f"Agent: {reply}")
 
-        reply = next((m.content for m in reversed(messages) if m.type == "ai"), "")
-        print(f"Agent> {reply}")
-        
-        # Add agent response to buffer
-        conversation_buffer.append(f"Agent: {reply}")
-        
-        # Periodic memory extraction (every 3 turns)
-        if len(conversation_buffer) >= 6:
-            _extract_and_store_memories(llm, memory_store, conversation_buffer)
-            conversation_buffer.clear()
+            # Periodic memory extraction (every 3 turns), in the background
+            # (pass a snapshot since the buffer is cleared right after)
+            if len(conversation_buffer) >= 6:
+                memory_executor.submit(
+                    _extract_and_store_memories,
+                    llm, memory_store, list(conversation_buffer)
+                )
+                conversation_buffer.clear()
+    finally:
+        # Let any in-flight extraction finish before exiting, then close
+        # the store so its FTS index is compacted with the final writes in
+        memory_executor.shutdown(wait=True)
+        memory_store.close()
 
 
 def _extract_and_store_memories(llm, memory_store: MemoryStore, conversation_buffer: list):
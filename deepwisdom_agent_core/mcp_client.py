@@ -4,14 +4,46 @@ Connects to MCP servers via stdio and wraps their tools as LangChain tools.
 """
 
 import asyncio
+import functools
 import json
 import os
+import threading
 from contextlib import asynccontextmanager
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 from langchain_core.tools import StructuredTool
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from pydantic import Field, create_model
+
+# JSON-schema primitive types -> Python types for tool argument models.
+# Preserving the declared type (instead of defaulting everything to str)
+# lets the LLM emit correctly typed arguments without coercion retries.
+_JSON_TO_PY = {
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "string": str,
+    "array": list,
+    "object": dict,
+}
+
+
+def _args_model_from_schema(tool_name: str, input_schema: Dict[str, Any]):
+    """Build a Pydantic args model from an MCP tool's JSON input schema."""
+    fields = {}
+    required = set(input_schema.get("required", []))
+    for prop_name, prop_info in input_schema.get("properties", {}).items():
+        prop_type = _JSON_TO_PY.get(prop_info.get("type", "string"), str)
+        prop_desc = prop_info.get("description", "")
+        if prop_name in required:
+            fields[prop_name] = (prop_type, Field(description=prop_desc))
+        else:
+            fields[prop_name] = (Optional[prop_type], Field(default=None, description=prop_desc))
+
+    if not fields:
+        return None
+    return create_model(f"{tool_name}Args", **fields)
 
 
 class MCPClient:
@@ -25,6 +57,28 @@ class MCPClient:
         self._read_stream = None
         self._write_stream = None
         self._tools_cache: List[Dict[str, Any]] = []
+        # One background event loop for the client's lifetime. All sync
+        # entry points dispatch onto it, so the stdio session is always
+        # driven by the loop that created it (asyncio.run per call would
+        # tear the loop down and orphan the session).
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop thread on first use."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(
+                target=self._loop.run_forever, daemon=True
+            )
+            self._loop_thread.start()
+        return self._loop
+
+    def _run_sync(self, coro, timeout: float = 60.0):
+        """Run a coroutine on the background loop and wait for its result."""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return future.result(timeout=timeout)
     
     @classmethod
     def from_env(cls, env_prefix: str = "MCP") -> Optional["MCPClient"]:
@@ -87,66 +141,43 @@ class MCPClient:
         """Call a tool on the MCP server."""
         if not self.session:
             raise RuntimeError("MCP session not initialized")
-        
+
         result = await self.session.call_tool(name, arguments)
         return result
+
+    def connect_sync(self):
+        """Connect from synchronous code via the background loop."""
+        self._run_sync(self.connect())
+
+    def call_tool_sync(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """Call a tool from synchronous code via the background loop."""
+        return self._run_sync(self.call_tool(name, arguments))
+
+    def _invoke_tool_sync(self, name: str, **kwargs) -> Any:
+        """Keyword-argument adapter used as the StructuredTool func."""
+        return self.call_tool_sync(name, kwargs)
     
+    def _wrap_tool(self, tool_info: Dict[str, Any]) -> StructuredTool:
+        """Wrap one MCP tool description as a LangChain StructuredTool."""
+        tool_name = tool_info.get("name", "unknown")
+        tool_desc = tool_info.get("description", "")
+        input_schema = tool_info.get("inputSchema", {})
+
+        # The func dispatches onto the client's background loop so the
+        # long-lived stdio session is reused
+        return StructuredTool(
+            name=tool_name,
+            description=tool_desc or f"MCP tool: {tool_name}",
+            func=functools.partial(self._invoke_tool_sync, tool_name),
+            args_schema=_args_model_from_schema(tool_name, input_schema),
+        )
+
     def wrap_as_langchain_tools(self) -> List[StructuredTool]:
         """
         Wrap MCP tools as LangChain StructuredTool objects.
         Each tool is given a function that calls back to this client.
         """
-        langchain_tools = []
-        
-        for tool_info in self._tools_cache:
-            tool_name = tool_info.get("name", "unknown")
-            tool_desc = tool_info.get("description", "")
-            input_schema = tool_info.get("inputSchema", {})
-            
-            # Create async wrapper for this specific tool
-            async def _async_wrapper(name=tool_name, **kwargs):
-                return await self.call_tool(name, kwargs)
-            
-            # Create sync wrapper using asyncio
-            def _sync_wrapper(name=tool_name, **kwargs):
-                return asyncio.run(_async_wrapper(name=name, **kwargs))
-            
-            # Parse input schema to get args_schema
-            # For simplicity, we'll use a basic dict type
-            from pydantic import BaseModel, create_model, Field
-            
-            # Build pydantic model from JSON schema
-            fields = {}
-            properties = input_schema.get("properties", {})
-            required = input_schema.get("required", [])
-            
-            for prop_name, prop_info in properties.items():
-                prop_type = str  # Default to str
-                prop_desc = prop_info.get("description", "")
-                is_required = prop_name in required
-                
-                if is_required:
-                    fields[prop_name] = (prop_type, Field(description=prop_desc))
-                else:
-                    fields[prop_name] = (Optional[prop_type], Field(default=None, description=prop_desc))
-            
-            # Create dynamic Pydantic model
-            if fields:
-                ArgsModel = create_model(f"{tool_name}Args", **fields)
-            else:
-                ArgsModel = None
-            
-            # Create LangChain tool
-            lc_tool = StructuredTool(
-                name=tool_name,
-                description=tool_desc or f"MCP tool: {tool_name}",
-                func=lambda name=tool_name, **kw: _sync_wrapper(name=name, **kw),
-                args_schema=ArgsModel,
-            )
-            
-            langchain_tools.append(lc_tool)
-        
-        return langchain_tools
+        return [self._wrap_tool(tool_info) for tool_info in self._tools_cache]
 
 
 @asynccontextmanager
@@ -169,20 +200,62 @@ async def get_mcp_client(env_prefix: str = "MCP"):
         await client.disconnect()
 
 
-def load_mcp_tools_sync(env_prefix: str = "MCP") -> List[StructuredTool]:
+# Tool lists already loaded this session, keyed by the env configuration
+# that produced them. A cache hit returns without re-reading env,
+# re-spawning the MCP server, or re-negotiating the protocol; the
+# connected client stays alive behind the cached tools' callbacks.
+_loaded_tools: Dict[tuple, List[StructuredTool]] = {}
+
+
+def iter_mcp_tools_sync(env_prefix: str = "MCP") -> Iterator[StructuredTool]:
     """
-    Synchronous helper to load MCP tools.
-    Returns empty list if MCP not configured.
+    Yield MCP tools one at a time as they are wrapped.
+    Yields nothing if MCP is not configured. The client stays connected
+    behind the yielded tools so later tool calls reuse its session.
+    Streaming lets callers start using (or printing) tool #0 while the
+    rest are still being built; the loaded list only enters the shared
+    cache once the iterator is exhausted, so abandoning it mid-way never
+    caches a partial tool set.
     """
-    async def _load():
-        async with get_mcp_client(env_prefix) as client:
-            if client is None:
-                return []
-            return client.wrap_as_langchain_tools()
-    
+    config_key = (
+        env_prefix,
+        os.getenv(f"{env_prefix}_SERVER_COMMAND") or "",
+        os.getenv(f"{env_prefix}_SERVER_ARGS") or "",
+    )
+    cached = _loaded_tools.get(config_key)
+    if cached is not None:
+        yield from cached
+        return
+
+    client = MCPClient.from_env(env_prefix)
+    if client is None:
+        _loaded_tools[config_key] = []
+        return
+
+    # The guard covers wrapping as well as connecting: a server whose
+    # tool descriptions the wrapper can't handle (unexpected shapes,
+    # schema names create_model rejects) must degrade to "no MCP tools",
+    # not crash the caller mid-iteration.
     try:
-        return asyncio.run(_load())
+        client.connect_sync()
+        tools = []
+        for tool_info in client.get_tools_list():
+            lc_tool = client._wrap_tool(tool_info)
+            tools.append(lc_tool)
+            yield lc_tool
     except Exception as e:
-        # If MCP fails to load, just return empty tools list
+        # If MCP fails to load, just stop yielding
+        # (not cached, so a transient failure can be retried)
         print(f"[MCP] Failed to load: {e}")
-        return []
+        return
+
+    _loaded_tools[config_key] = tools
+
+
+def load_mcp_tools_sync(env_prefix: str = "MCP") -> List[StructuredTool]:
+    """
+    Synchronous helper to load MCP tools as a list.
+    Thin wrapper over iter_mcp_tools_sync for callers that want the
+    whole tool set at once; shares its cache and failure behavior.
+    """
+    return list(iter_mcp_tools_sync(env_prefix))
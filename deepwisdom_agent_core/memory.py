@@ -2,6 +2,11 @@
 Memory Store for long-term user information.
 Supports four memory types: preference, profile, constraint, fact.
 Stores in SQLite (memory.sqlite) with retrieve/upsert capabilities.
+
+Retrieval is deliberately keyword-based (FTS5/BM25 with a scan fallback):
+no embeddings are computed or stored, so the store has no vector matrix to
+index, quantize, or ship to an ANN library. If vector recall is added
+later it should live behind retrieve() without changing this interface.
 """
 
 import json
@@ -13,99 +18,301 @@ from typing import List, Literal
 
 MemoryType = Literal["preference", "profile", "constraint", "fact"]
 
+# Module-level SQL constants: sqlite3 caches compiled statements per
+# connection keyed on the exact SQL string, so reusing one string object
+# for every call guarantees the prepare/plan step is paid once.
+_SQL_UPSERT = """
+    INSERT INTO memories (memory_type, key, value, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(memory_type, key) DO UPDATE SET
+        value = excluded.value,
+        updated_at = excluded.updated_at
+"""
+
+_SQL_RETRIEVE_FTS = """
+    SELECT m.memory_type, m.key, m.value
+    FROM memories_fts f
+    JOIN memories m ON m.id = f.rowid
+    WHERE memories_fts MATCH ?
+    ORDER BY bm25(memories_fts)
+    LIMIT ?
+"""
+
+# upsert_many sends one multi-row VALUES statement per chunk instead of
+# executemany: one prepare + one bind pass for the whole chunk rather
+# than a per-row binding loop. Chunk size keeps 3 parameters per row
+# under SQLite's default 999-variable limit. Statements are cached per
+# row count so full chunks reuse one compiled statement.
+_UPSERT_CHUNK = 333
+_sql_upsert_many_cache: dict = {}
+
+
+def _sql_upsert_many(row_count: int) -> str:
+    sql = _sql_upsert_many_cache.get(row_count)
+    if sql is None:
+        sql = (
+            "INSERT INTO memories (memory_type, key, value, updated_at) VALUES "
+            + ", ".join(["(?, ?, ?, CURRENT_TIMESTAMP)"] * row_count)
+            + " ON CONFLICT(memory_type, key) DO UPDATE SET"
+            " value = excluded.value, updated_at = excluded.updated_at"
+        )
+        _sql_upsert_many_cache[row_count] = sql
+    return sql
+
 
-@dataclass
+# The searchable text is concatenated in SQL but case-folded in Python:
+# SQLite's lower() only folds ASCII, which would break non-ASCII matches
+# ("Ärger" vs "ärger") on exactly the fallback path that exists for
+# compatibility.
+_SQL_RETRIEVE_ALL = """
+    SELECT memory_type, key, value, key || ' ' || value
+    FROM memories
+    ORDER BY updated_at DESC
+"""
+
+
+# slots=True drops the per-instance __dict__ (retrieve can materialize
+# many of these per query); frozen=True matches how entries are used —
+# they are value objects that are built once and never mutated.
+@dataclass(slots=True, frozen=True)
 class MemoryEntry:
     memory_type: MemoryType
     key: str
     value: str
-    
+
 
 class MemoryStore:
-    """SQLite-backed memory storage with structured extract and retrieve."""
+    """SQLite-backed memory storage with structured extract and retrieve.
+
+    The store does no console or logging I/O of its own: upsert/retrieve
+    are sub-millisecond SQLite calls, and even a single formatted write
+    per row would dominate them on a bulk ingest. Status output belongs
+    to callers (the REPL in main.py prints once per extraction batch).
+    """
     
-    def __init__(self, db_path: str = "memory.sqlite"):
+    def __init__(self, db_path: str = "memory.sqlite", *, durability: str = "default"):
+        if durability not in ("default", "test"):
+            raise ValueError(f"Unknown durability mode: {durability}")
         self.db_path = Path(db_path)
+        self.durability = durability
+        # One connection for the store's lifetime: opening per call pays
+        # file-open + journal setup each time. check_same_thread=False so
+        # background extraction threads can share it (WAL allows concurrent
+        # readers alongside the writer).
+        self.conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=256
+        )
+        # Retrieval cache invalidated by a store version counter: every
+        # upsert bumps the version, so a repeated query between writes is
+        # answered without touching the database.
+        self._version = 0
+        self._retrieve_cache = {}  # (query, top_k) -> (version, entries)
         self._init_db()
-    
+
     def _init_db(self):
-        """Initialize SQLite schema."""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS memories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    memory_type TEXT NOT NULL,
-                    key TEXT NOT NULL,
-                    value TEXT NOT NULL,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(memory_type, key)
-                )
+        """Initialize SQLite schema and connection pragmas.
+
+        WAL turns commits into append-only log writes (and allows readers
+        concurrent with the writer); synchronous=NORMAL drops the extra
+        journal-header fsync per commit, which dominates small write
+        bursts. mmap_size lets reads go through the page cache mapping
+        instead of read() calls.
+
+        durability='test' trades crash safety for speed on throwaway
+        stores: the rollback journal lives in memory, fsyncs are skipped
+        entirely, and the single-owner file lock is taken once instead of
+        per transaction. Only for databases whose loss is acceptable.
+        """
+        if self.durability == "test":
+            self.conn.executescript("""
+                PRAGMA journal_mode=MEMORY;
+                PRAGMA synchronous=OFF;
+                PRAGMA locking_mode=EXCLUSIVE;
+                PRAGMA temp_store=MEMORY;
             """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_type_key 
-                ON memories(memory_type, key)
+        else:
+            self.conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA mmap_size=268435456;
             """)
-            conn.commit()
-        finally:
-            conn.close()
-    
-    def upsert(self, memory_type: MemoryType, key: str, value: str):
-        """Insert or update a memory entry."""
-        conn = sqlite3.connect(self.db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS memories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                memory_type TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(memory_type, key)
+            )
+        """)
+        # UNIQUE(memory_type, key) already creates the index that serves
+        # ON CONFLICT upserts and (type, key) lookups; the explicit
+        # idx_type_key duplicated it and only slowed writes, so it is
+        # dropped from existing databases. What the scan fallback does
+        # need is the recency ordering: an updated_at index lets
+        # ORDER BY updated_at DESC walk the index instead of sorting
+        # the table on every retrieve.
+        self.conn.executescript("""
+            DROP INDEX IF EXISTS idx_type_key;
+            CREATE INDEX IF NOT EXISTS idx_updated_at
+            ON memories(updated_at DESC);
+        """)
+        # Full-text index over key/value, kept in sync by triggers so
+        # retrieve() can use SQLite's inverted index + BM25 ranking instead
+        # of scanning every row in Python. Optional: some builds ship
+        # without FTS5, in which case retrieve() falls back to the scan.
         try:
-            conn.execute("""
-                INSERT INTO memories (memory_type, key, value, updated_at)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                ON CONFLICT(memory_type, key) DO UPDATE SET
-                    value = excluded.value,
-                    updated_at = excluded.updated_at
-            """, (memory_type, key, value))
-            conn.commit()
-        finally:
-            conn.close()
-    
-    def upsert_many(self, entries: List[MemoryEntry]):
-        """Batch upsert multiple entries."""
-        conn = sqlite3.connect(self.db_path)
+            fts_exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master"
+                " WHERE type = 'table' AND name = 'memories_fts'"
+            ).fetchone() is not None
+            self.conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts
+                USING fts5(key, value, content='memories', content_rowid='id');
+                CREATE TRIGGER IF NOT EXISTS memories_fts_ai
+                AFTER INSERT ON memories BEGIN
+                    INSERT INTO memories_fts(rowid, key, value)
+                    VALUES (new.id, new.key, new.value);
+                END;
+                CREATE TRIGGER IF NOT EXISTS memories_fts_ad
+                AFTER DELETE ON memories BEGIN
+                    INSERT INTO memories_fts(memories_fts, rowid, key, value)
+                    VALUES ('delete', old.id, old.key, old.value);
+                END;
+                CREATE TRIGGER IF NOT EXISTS memories_fts_au
+                AFTER UPDATE ON memories BEGIN
+                    INSERT INTO memories_fts(memories_fts, rowid, key, value)
+                    VALUES ('delete', old.id, old.key, old.value);
+                    INSERT INTO memories_fts(rowid, key, value)
+                    VALUES (new.id, new.key, new.value);
+                END;
+            """)
+            if not fts_exists:
+                # First time the FTS table is created over this database:
+                # the external-content table starts empty and the triggers
+                # only see writes from here on, so rows persisted before
+                # the upgrade must be indexed once or they become
+                # unretrievable (the FTS query "succeeds" with zero hits,
+                # which also keeps the scan fallback from running).
+                self.conn.execute(
+                    "INSERT INTO memories_fts(memories_fts) VALUES('rebuild')"
+                )
+            self._has_fts = True
+        except sqlite3.OperationalError:
+            self._has_fts = False
+        self.conn.commit()
+
+    def close(self):
+        """Close the underlying connection, compacting the FTS index first."""
+        if self._has_fts:
+            # Incremental trigger-fed updates fragment the FTS b-tree;
+            # merging segments on close keeps lookups fast as the store grows.
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT INTO memories_fts(memories_fts) VALUES('optimize')"
+                    )
+            except sqlite3.OperationalError:
+                pass
+        self.conn.close()
+
+    def __del__(self):
         try:
-            conn.executemany("""
-                INSERT INTO memories (memory_type, key, value, updated_at)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                ON CONFLICT(memory_type, key) DO UPDATE SET
-                    value = excluded.value,
-                    updated_at = excluded.updated_at
-            """, [(e.memory_type, e.key, e.value) for e in entries])
-            conn.commit()
-        finally:
-            conn.close()
-    
+            self.conn.close()
+        except Exception:
+            pass
+
+    def upsert(self, memory_type: MemoryType, key: str, value: str):
+        """Insert or update a memory entry.
+
+        Deliberately returns nothing: no RETURNING clause and no follow-up
+        SELECT, so the write never materializes a result set. Callers that
+        want the stored row back should go through retrieve().
+        """
+        with self.conn:
+            self.conn.execute(_SQL_UPSERT, (memory_type, key, value))
+        self._version += 1
+
+    def upsert_many(self, entries: List[MemoryEntry]):
+        """Batch upsert multiple entries in one transaction.
+
+        Rows are sent as multi-row VALUES statements (chunked to respect
+        the SQLite parameter limit), so a burst of N entries costs one
+        bind pass per chunk instead of N.
+        """
+        if not entries:
+            return
+        with self.conn:
+            for start in range(0, len(entries), _UPSERT_CHUNK):
+                chunk = entries[start:start + _UPSERT_CHUNK]
+                params = []
+                for e in chunk:
+                    params += (e.memory_type, e.key, e.value)
+                self.conn.execute(_sql_upsert_many(len(chunk)), params)
+        self._version += 1
+
     def retrieve(self, query: str, top_k: int = 5) -> List[MemoryEntry]:
         """
-        Simple keyword-based retrieve (no vector search).
-        Returns top_k memories where key or value contains any query token.
+        Keyword-based retrieve (no vector search).
+        Uses the FTS5 index with BM25 ranking when available; otherwise
+        falls back to scanning rows and counting token matches in Python.
+        Results are cached until the next upsert, keyed by the sorted
+        token multiset so case, whitespace and word-order variants of the
+        same query ("Python data" / "data python") share one entry —
+        scoring is order-insensitive in both query paths, so this is
+        lossless.
         """
+        cache_key = (" ".join(sorted(query.lower().split())), top_k)
+        cached = self._retrieve_cache.get(cache_key)
+        if cached is not None and cached[0] == self._version:
+            return list(cached[1])
+
+        entries = self._retrieve_uncached(query, top_k)
+
+        if len(self._retrieve_cache) >= 128:
+            self._retrieve_cache.clear()
+        self._retrieve_cache[cache_key] = (self._version, entries)
+        return list(entries)
+
+    def _retrieve_uncached(self, query: str, top_k: int) -> List[MemoryEntry]:
         tokens = [t.lower() for t in query.split() if t]
         if not tokens:
             return []
-        
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cursor = conn.execute("""
-                SELECT memory_type, key, value FROM memories
-                ORDER BY updated_at DESC
-            """)
-            rows = cursor.fetchall()
-        finally:
-            conn.close()
-        
+
+        if self._has_fts:
+            # Quote each token and match by prefix; any-token match (OR)
+            # mirrors the fallback scoring.
+            match = " OR ".join('"{}" *'.format(t.replace('"', '""')) for t in tokens)
+            try:
+                cursor = self.conn.execute(_SQL_RETRIEVE_FTS, (match, top_k))
+                return [MemoryEntry(*row) for row in cursor.fetchall()]
+            except sqlite3.OperationalError:
+                # Malformed MATCH expression for unusual tokens: fall back
+                pass
+
+        # Fallback scan: the searchable text is concatenated inside SQLite
+        # rather than rebuilt per row in Python (case folding stays in
+        # Python — see _SQL_RETRIEVE_ALL); the loop only counts token hits
+        # and keeps scoring rows. Single-token queries (the common case)
+        # skip the per-row generator entirely.
         results = []
-        for memory_type, key, value in rows:
-            text = f"{key} {value}".lower()
-            score = sum(text.count(t) for t in tokens)
-            if score > 0:
-                results.append((score, MemoryEntry(memory_type, key, value)))
-        
+        if len(tokens) == 1:
+            token = tokens[0]
+            for memory_type, key, value, text in self.conn.execute(_SQL_RETRIEVE_ALL):
+                score = text.lower().count(token)
+                if score > 0:
+                    results.append((score, MemoryEntry(memory_type, key, value)))
+        else:
+            for memory_type, key, value, text in self.conn.execute(_SQL_RETRIEVE_ALL):
+                text = text.lower()
+                score = 0
+                for token in tokens:
+                    score += text.count(token)
+                if score > 0:
+                    results.append((score, MemoryEntry(memory_type, key, value)))
+
         results.sort(key=lambda x: x[0], reverse=True)
         return [entry for _, entry in results[:top_k]]
     
@@ -113,54 +320,65 @@ class MemoryStore:
         """Format memory entries for injection into system context."""
         if not entries:
             return ""
-        
-        lines = ["[User Memory]"]
-        for e in entries:
-            lines.append(f"- {e.memory_type.capitalize()}: {e.key} = {e.value}")
-        return "\n".join(lines)
+
+        return "[User Memory]\n" + "\n".join(
+            f"- {e.memory_type.capitalize()}: {e.key} = {e.value}" for e in entries
+        )
+
+
+# Gate for extract_memories_with_llm: token signatures of conversation
+# windows that were already sent for extraction. A new window nearly
+# identical to a processed one (Jaccard >= threshold) yields no new facts,
+# so the LLM round-trip — the dominant latency in the agent loop — is
+# skipped entirely.
+_EXTRACTION_HISTORY_MAX = 64
+_EXTRACTION_SKIP_THRESHOLD = 0.9
+_extraction_history: List[frozenset] = []
+
+
+def _seen_similar_conversation(signature: frozenset) -> bool:
+    for seen in _extraction_history:
+        union = len(signature | seen)
+        if union and len(signature & seen) / union >= _EXTRACTION_SKIP_THRESHOLD:
+            return True
+    return False
 
 
 def extract_memories_with_llm(llm, conversation_history: str) -> List[MemoryEntry]:
     """
     Use an extra LLM call to extract structured memories from conversation.
     Returns a list of MemoryEntry objects.
-    """
-    extraction_prompt = f"""Analyze the following conversation and extract user-related information.
-Return a JSON array of memory objects. Each object should have:
-- "memory_type": one of ["preference", "profile", "constraint", "fact"]
-- "key": a short label (e.g., "language", "role", "tech_stack")
-- "value": the specific information
-
-Only extract information that is explicitly stated or strongly implied about the user.
 
-Examples:
-- preference: language=Chinese, style=concise
-- profile: role=data scientist, project=ML research
-- constraint: deadline=next week, budget=limited
-- fact: uses Python 3.11, works on Windows
-
-Conversation:
-{conversation_history}
-
-Return valid JSON array only, no markdown or extra text:"""
+    Conversations near-duplicating an already-extracted window are skipped
+    without calling the LLM (token-overlap gate). Uses JSON mode
+    (response_format=json_object), so the model is grammar-constrained to
+    valid JSON: the prompt stays short and no markdown-fence repair is
+    needed on the way back.
+    """
+    signature = frozenset(conversation_history.lower().split())
+    if signature and _seen_similar_conversation(signature):
+        return []
+    extraction_prompt = (
+        'Extract user-related memories from the conversation as JSON: '
+        '{"memories": [{"memory_type": "preference"|"profile"|"constraint"|"fact", '
+        '"key": "<short label>", "value": "<the specific information>"}]}. '
+        "Only include what is explicitly stated or strongly implied about the user.\n\n"
+        f"Conversation:\n{conversation_history}"
+    )
 
     try:
-        response = llm.invoke(extraction_prompt)
-        content = response.content.strip()
-        
-        # Remove markdown code fences if present
-        if content.startswith("```"):
-            lines = content.split("\n")
-            content = "\n".join(lines[1:-1]) if len(lines) > 2 else content
-        
-        data = json.loads(content)
-        
-        if not isinstance(data, list):
+        response = llm.bind(
+            response_format={"type": "json_object"}
+        ).invoke(extraction_prompt)
+        data = json.loads(response.content)
+
+        items = data.get("memories", []) if isinstance(data, dict) else data
+        if not isinstance(items, list):
             return []
-        
+
         entries = []
         valid_types = {"preference", "profile", "constraint", "fact"}
-        for item in data:
+        for item in items:
             if not isinstance(item, dict):
                 continue
             mem_type = item.get("memory_type", "")
@@ -170,7 +388,13 @@ Return valid JSON array only, no markdown or extra text:"""
             value = str(item.get("value", "")).strip()
             if key and value:
                 entries.append(MemoryEntry(mem_type, key, value))
-        
+
+        # Only remember windows that made it through a successful call, so
+        # a transient API failure doesn't suppress a future retry
+        _extraction_history.append(signature)
+        if len(_extraction_history) > _EXTRACTION_HISTORY_MAX:
+            del _extraction_history[0]
+
         return entries
     except Exception:
         # If extraction fails, return empty list
@@ -1,8 +1,21 @@
-﻿import json
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from langchain_core.tools import tool
 
+_WORD_RE = re.compile(r"\w+")
+
+# Inverted index over docs/, built lazily on first search and reused across
+# tool calls: token -> {doc relpath -> term frequency}. The corpus is only
+# re-read when a file's (mtime, size) fingerprint changes, so a warm search
+# does no disk I/O except for snippet extraction on the winning docs.
+_index_fingerprint = None
+_index_postings = {}
+
 
 def _iter_docs(root: Path):
     exts = {".txt", ".md", ".markdown"}
@@ -11,6 +24,60 @@ def _iter_docs(root: Path):
             yield path
 
 
+def _fingerprint(docs_dir: Path):
+    entries = []
+    for path in _iter_docs(docs_dir):
+        stat = path.stat()
+        entries.append((str(path.relative_to(docs_dir)), stat.st_mtime_ns, stat.st_size))
+    entries.sort()
+    return tuple(entries)
+
+
+def _tokenize_doc(args):
+    docs_dir, path = args
+    try:
+        text = path.read_text(encoding="utf-8", errors="ignore")
+    except OSError:
+        return None
+    return str(path.relative_to(docs_dir)), Counter(_WORD_RE.findall(text.lower()))
+
+
+def _build_postings(docs_dir: Path) -> dict:
+    # Reading dominates the (re)build, so fan the per-file read+tokenize
+    # across a thread pool and merge the counters serially. Empty files
+    # can't contribute a match and are skipped without opening them.
+    paths = [p for p in _iter_docs(docs_dir) if p.stat().st_size > 0]
+    postings = {}
+    if not paths:
+        return postings
+    workers = min(len(paths), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_tokenize_doc, ((docs_dir, p) for p in paths)):
+            if result is None:
+                continue
+            rel, counts = result
+            for token, freq in counts.items():
+                postings.setdefault(token, {})[rel] = freq
+    return postings
+
+
+def _get_postings(docs_dir: Path) -> dict:
+    global _index_fingerprint, _index_postings
+    fingerprint = _fingerprint(docs_dir)
+    if fingerprint != _index_fingerprint:
+        _index_postings = _build_postings(docs_dir)
+        _index_fingerprint = fingerprint
+    return _index_postings
+
+
+def _token_pattern(tokens) -> "re.Pattern":
+    """Combine query tokens into one alternation so each document is scanned
+    in a single C-level pass instead of one .find() pass per token."""
+    # Longest-first so overlapping tokens prefer the fuller match.
+    parts = sorted((re.escape(t) for t in tokens), key=len, reverse=True)
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
 def _make_snippet(text: str, idx: int, window: int = 80) -> str:
     start = max(0, idx - window)
     end = min(len(text), idx + window)
@@ -29,33 +96,53 @@ def local_search(query: str, top_k: int = 3) -> str:
     if not query:
         return json.dumps([], ensure_ascii=True)
 
+    # Split query tokens by how they can be matched: plain \w+ tokens go
+    # through the index, while tokens containing non-word characters
+    # ("C++", "main.py") are counted literally with a raw scan — the
+    # index vocabulary only holds \w+ words, and folding such tokens to
+    # their word parts would let fragments like "py" match every
+    # "python", outranking the doc with the literal hit.
     tokens = [t for t in query.lower().split() if t]
     if not tokens:
         tokens = [query.lower()]
+    word_tokens = [t for t in tokens if _WORD_RE.fullmatch(t)]
+    literal_tokens = [t for t in tokens if not _WORD_RE.fullmatch(t)]
+
+    scores = Counter()
+    if word_tokens:
+        # Score against the index: a query token matches any indexed word
+        # that contains it, keeping substring-count semantics without
+        # rescanning the corpus.
+        postings = _get_postings(docs_dir)
+        for token in word_tokens:
+            for word, doc_freqs in postings.items():
+                if token in word:
+                    scores.update(doc_freqs)
+    if literal_tokens:
+        # One raw pass over the corpus covers all literal tokens, same
+        # substring counting as the pre-index implementation.
+        for path in _iter_docs(docs_dir):
+            try:
+                text = path.read_text(encoding="utf-8", errors="ignore").lower()
+            except OSError:
+                continue
+            rel = str(path.relative_to(docs_dir))
+            for token in literal_tokens:
+                count = text.count(token)
+                if count:
+                    scores[rel] += count
 
+    # Only the winning docs are opened again, for snippet extraction; one
+    # combined-pattern pass per doc finds the earliest token hit without
+    # lowercasing a copy of the whole text.
+    pattern = _token_pattern(tokens)
     results = []
-    for path in _iter_docs(docs_dir):
+    for rel, score in scores.most_common(max(1, top_k)):
         try:
-            text = path.read_text(encoding="utf-8", errors="ignore")
+            text = (docs_dir / rel).read_text(encoding="utf-8", errors="ignore")
         except OSError:
             continue
-        lower = text.lower()
-        score = sum(lower.count(t) for t in tokens)
-        if score <= 0:
-            continue
-        first_idx = min((lower.find(t) for t in tokens if t in lower), default=0)
-        snippet = _make_snippet(text, first_idx)
-        results.append(
-            {
-                "source": str(path.relative_to(docs_dir)),
-                "snippet": snippet,
-                "score": score,
-            }
-        )
-
-    results.sort(key=lambda r: r["score"], reverse=True)
-    trimmed = [
-        {"source": r["source"], "snippet": r["snippet"]}
-        for r in results[: max(1, top_k)]
-    ]
-    return json.dumps(trimmed, ensure_ascii=True)
\ No newline at end of file
+        match = pattern.search(text)
+        first_idx = match.start() if match else 0
+        results.append({"source": rel, "snippet": _make_snippet(text, first_idx)})
+    return json.dumps(results, ensure_ascii=True)
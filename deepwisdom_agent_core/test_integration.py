@@ -5,7 +5,6 @@ Run this to verify the basic functionality without full agent interaction.
 
 import os
 import sys
-from pathlib import Path
 
 # Test 1: Memory Store
 print("=" * 60)
@@ -14,19 +13,19 @@ print("=" * 60)
 
 from memory import MemoryStore, MemoryEntry
 
-# Create a test memory store
-test_db = "test_memory.sqlite"
-if Path(test_db).exists():
-    Path(test_db).unlink()
-
-store = MemoryStore(test_db)
-print("✓ MemoryStore initialized")
-
-# Test upsert
-store.upsert("preference", "language", "Chinese")
-store.upsert("profile", "role", "data scientist")
-store.upsert("constraint", "tech_stack", "Python 3.11")
-store.upsert("fact", "os", "Windows")
+# In-memory test store: no disk files, fsyncs, or cleanup round-trips;
+# durability='test' additionally drops journaling/sync overhead so the
+# same call stays cheap if pointed at a throwaway file database
+store = MemoryStore(":memory:", durability="test")
+print("✓ MemoryStore initialized (in-memory)")
+
+# Test batch upsert (one transaction / fsync instead of four)
+store.upsert_many([
+    MemoryEntry("preference", "language", "Chinese"),
+    MemoryEntry("profile", "role", "data scientist"),
+    MemoryEntry("constraint", "tech_stack", "Python 3.11"),
+    MemoryEntry("fact", "os", "Windows"),
+])
 print("✓ Upserted 4 memories")
 
 # Test retrieve
@@ -39,32 +38,39 @@ for r in results:
 formatted = store.format_for_prompt(results)
 print(f"✓ Formatted for prompt:\n{formatted}")
 
-# Cleanup
-Path(test_db).unlink()
-print("✓ Test database cleaned up\n")
+print()
 
 # Test 2: MCP Client (basic structure check)
 print("=" * 60)
 print("Test 2: MCP Client Structure")
 print("=" * 60)
 
-from mcp_client import MCPClient, load_mcp_tools_sync
-
-# Check if MCP is configured
-mcp_command = os.getenv("MCP_SERVER_COMMAND")
-if mcp_command:
-    print(f"✓ MCP configured: {mcp_command}")
-    print("  Attempting to load tools (this may take a moment)...")
-    try:
-        tools = load_mcp_tools_sync()
-        print(f"✓ Loaded {len(tools)} MCP tools:")
-        for tool in tools:
-            print(f"  - {tool.name}: {tool.description}")
-    except Exception as e:
-        print(f"✗ MCP loading failed: {e}")
+# Import inside the test block: mcp_client drags in the mcp + langchain
+# dependency trees, so an uninstalled dependency (or its import latency)
+# stays confined to this test instead of killing Test 1's output
+try:
+    from mcp_client import MCPClient, iter_mcp_tools_sync
+except ImportError as e:
+    print(f"✗ MCP client unavailable: {e}")
 else:
-    print("○ MCP not configured (set MCP_SERVER_COMMAND to test)")
-    print("  This is expected if you haven't set up an MCP server")
+    # Check if MCP is configured
+    mcp_command = os.getenv("MCP_SERVER_COMMAND")
+    if mcp_command:
+        print(f"✓ MCP configured: {mcp_command}")
+        print("  Attempting to load tools (this may take a moment)...")
+        try:
+            # Stream tools as they are wrapped instead of waiting for the
+            # full list: first tools print while the rest are negotiated
+            count = 0
+            for tool in iter_mcp_tools_sync():
+                count += 1
+                print(f"  - {tool.name}: {tool.description}")
+            print(f"✓ Loaded {count} MCP tools")
+        except Exception as e:
+            print(f"✗ MCP loading failed: {e}")
+    else:
+        print("○ MCP not configured (set MCP_SERVER_COMMAND to test)")
+        print("  This is expected if you haven't set up an MCP server")
 
 print()
 